@@ -1,12 +1,16 @@
 from typing import List
 import asyncio
 import logging
-from fastapi import APIRouter, Path, HTTPException
+import math
+import time
+from fastapi import APIRouter, Path, Query, HTTPException
 from app.config import DEFAULT_PUMP_IDS, TIMEOUT
 from app.core import PumpService
-from app.schemas import PumpStatusOut, PresetIn
+from app.schemas import (PumpStatusOut, PresetIn, PumpHistoryOut,
+                         BatchIn, BatchResultOut)
+from app.history import history
 from app.driver import driver
-from app.enums import DartTrans, PumpStatus
+from app.enums import DartTrans, PumpStatus, DccCmd
 
 router = APIRouter(prefix="/pump", tags=["Pump operations"])
 logger = logging.getLogger("mekser.api")
@@ -41,6 +45,30 @@ def get_status(pump_id: int = Path(..., ge=1, le=len(DEFAULT_PUMP_IDS),
     data = PumpService.return_status(pump_id)
     return _not_found(data)
 
+@router.get("/{pump_id}/history", response_model=PumpHistoryOut,
+            summary="Get pump state history",
+            description="История status/volume/amount/alarm из памяти шлюза "
+                        "(без обращения к шине). По умолчанию – последний час.")
+def get_history(pump_id: int = Path(..., ge=1, le=len(DEFAULT_PUMP_IDS)),
+                start: float | None = Query(None, alias="from",
+                                            description="Начало, Unix-время (с)"),
+                end: float | None = Query(None, alias="to",
+                                          description="Конец, Unix-время (с)"),
+                step: float | None = Query(None, gt=0,
+                                           description="Шаг даунсэмплинга, с")):
+    for name, value in (("from", start), ("to", end), ("step", step)):
+        if value is not None and not math.isfinite(value):
+            raise HTTPException(400, f"'{name}' должно быть конечным числом")
+    if end is None:
+        end = time.time()
+    if start is None:
+        start = end - 3600
+    if start > end:
+        raise HTTPException(400, "'from' должно быть не больше 'to'")
+    samples = history.query(pump_id, start, end, step)
+    return {"pump_id": pump_id, "start": start, "end": end,
+            "step": step, "samples": samples}
+
 @router.post("/{pump_id}/price", summary="Update pump prices",
              description="Установка списка цен (CD5 → DC3 при запросе).")
 def update_price(pump_id: int, prices: List[float]):
@@ -87,3 +115,19 @@ def reset(pump_id: int = Path(..., ge=1)):
 def switch_off(pump_id: int = Path(..., ge=1)):
     data = PumpService.switch_off(pump_id)
     return _not_found(data)
+
+@router.post("/batch", response_model=List[BatchResultOut],
+             summary="Group commands",
+             description="Несколько команд CD1 (stop / switch_off / reset / authorize) "
+                         "за один проход по шине: сначала STOP/SWITCH_OFF, затем RESET, "
+                         "пресеты и AUTHORIZE. Результат – по каждой команде.")
+def batch(body: BatchIn):
+    commands = [{"pump_id": c.pump_id,
+                 "command": DccCmd[c.command.upper()],
+                 "volume": c.volume,
+                 "amount": c.amount}
+                for c in body.commands]
+    try:
+        return PumpService.batch(commands)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
@@ -3,6 +3,7 @@
 При необходимости параметры можно читать из переменных окружения.
 """
 import logging
+import os
 from pathlib import Path
 from typing import Final
 import serial
@@ -22,6 +23,34 @@ DEFAULT_PUMP_IDS = list(range(1, 5))
 # -------- WebSocket --------
 WS_POLL_INTERVAL: Final[float] = TIMEOUT  # интервал опроса статусов для WebSocket
 
+# -------- Трассировка ----------
+# Server-Timing в каждом ответе; дерево спанов пишется для доли запросов
+# TRACE_SAMPLE_RATE (0 – выкл.), если запрос дольше TRACE_SLOW_MS.
+TRACE_ENABLED:     Final[bool]  = os.getenv("MEKSER_TRACE", "1") != "0"
+TRACE_SAMPLE_RATE: Final[float] = float(os.getenv("MEKSER_TRACE_SAMPLE_RATE", "0"))
+TRACE_SLOW_MS:     Final[float] = float(os.getenv("MEKSER_TRACE_SLOW_MS", "1000"))
+
+# -------- История состояний ----------
+# Ёмкость кольцевого буфера на колонку (~27 байт на отсчёт),
+# heartbeat – как часто писать отсчёт, даже если ничего не менялось.
+HISTORY_CAPACITY:      Final[int]   = int(os.getenv("MEKSER_HISTORY_CAPACITY", "8192"))
+HISTORY_HEARTBEAT:     Final[float] = float(os.getenv("MEKSER_HISTORY_HEARTBEAT", "60"))
+# Фоновый опрос для наполнения истории без клиентов WebSocket (0 – выкл.)
+HISTORY_POLL_INTERVAL: Final[float] = float(os.getenv("MEKSER_HISTORY_POLL_INTERVAL", "0"))
+
+# -------- Outbox (выгрузка в головной офис) ----------
+# Пустой OUTBOX_URL – выгрузка выключена.
+OUTBOX_URL:            Final[str]   = os.getenv("MEKSER_OUTBOX_URL", "")
+OUTBOX_DB:             Final[str]   = os.getenv(
+    "MEKSER_OUTBOX_DB", str(Path(__file__).resolve().parent.parent / "outbox.sqlite3"))
+OUTBOX_SOURCE:         Final[str]   = os.getenv("MEKSER_OUTBOX_SOURCE", "mekser")
+OUTBOX_BATCH_MAX:      Final[int]   = int(os.getenv("MEKSER_OUTBOX_BATCH_MAX", "500"))
+OUTBOX_BATCH_BYTES:    Final[int]   = int(os.getenv("MEKSER_OUTBOX_BATCH_BYTES", "262144"))
+OUTBOX_FLUSH_INTERVAL: Final[float] = float(os.getenv("MEKSER_OUTBOX_FLUSH_INTERVAL", "5"))
+OUTBOX_MAX_BACKOFF:    Final[float] = float(os.getenv("MEKSER_OUTBOX_MAX_BACKOFF", "60"))
+OUTBOX_MAX_EVENTS:     Final[int]   = int(os.getenv("MEKSER_OUTBOX_MAX_EVENTS", "100000"))
+OUTBOX_HTTP_TIMEOUT:   Final[float] = float(os.getenv("MEKSER_OUTBOX_HTTP_TIMEOUT", "10"))
+
 
 # -------- Логика ----------------
 CRC_INIT = 0x0000
@@ -4,11 +4,13 @@ core.py – слой бизнес-операций. Сюда не “проса
 """
 
 import threading, time, logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from app.config import TIMEOUT
 from .driver import calc_crc, driver
 from .enums import PumpStatus, DccCmd, DecimalConfig, DartTrans
+from .history import history
+from .tracing import span
 
 logger = logging.getLogger("mekser.core")
 
@@ -27,9 +29,25 @@ def int_to_bcd(n: int, width: int = 4) -> bytes:
     s = str(n).rjust(width * 2, "0")
     return bytes(int(s[i:i+2]) for i in range(0, len(s), 2))
 
+# Приоритет групповых команд: сначала всё, что останавливает отпуск топлива.
+_BATCH_PRIORITY = {
+    DccCmd.STOP:       0,
+    DccCmd.SWITCH_OFF: 0,
+    DccCmd.RESET:      1,
+    DccCmd.AUTHORIZE:  3,   # 2 – пресеты CD3/CD4 перед AUTHORIZE
+}
+
+def _status_name(code: int | None) -> str | None:
+    """Имя PumpStatus по коду; None для неизвестного или отсутствующего кода."""
+    try:
+        return PumpStatus(code).name
+    except ValueError:
+        return None
+
 # ———— PumpService ———— #
 class PumpService:
 
+    @classmethod
     def _parse_frame(cls, frame: bytes) -> dict:
         """
         Парсит любой принятый буфер и извлекает транзакции DC1, DC2, DC3, DC5.
@@ -193,14 +211,17 @@ class PumpService:
     @classmethod
     def return_status(cls, pump_id: int):
         logger.info(f"return_status: pump_id={pump_id}")
-        frame = driver.cd1(pump_id, DccCmd.RETURN_STATUS)
-        logger.debug(f"Raw frame received: {frame.hex()}")
+        with span("return_status"):
+            frame = driver.cd1(pump_id, DccCmd.RETURN_STATUS)
+            logger.debug(f"Raw frame received: {frame.hex()}")
 
-        if not frame:
-            logger.error("Empty frame on status")
-            return {}
-        parsed = cls._parse_frame(frame)
+            if not frame:
+                logger.error("Empty frame on status")
+                return {}
+            with span("parse"):
+                parsed = cls._parse_frame(frame)
         logger.info(f"Parsed status: {parsed}")
+        history.record(pump_id, parsed)
         return parsed
 
 
@@ -208,32 +229,113 @@ class PumpService:
     def authorize(cls, pump_id: int, volume: float | None = None, amount: float | None = None)-> dict:
         # (1) при необходимости – пресет
         logger.info(f"authorize: pump_id={pump_id}, volume={volume}, amount={amount}")
-        if volume is not None:
-            v_int = int(volume * 10**DecimalConfig.VOLUME.value)
-            driver.cd3_preset_volume(pump_id, int_to_bcd(v_int))
-            time.sleep(TIMEOUT)
-        if amount is not None:
-            a_int = int(amount * 10**DecimalConfig.AMOUNT.value)
-            driver.cd4_preset_amount(pump_id, int_to_bcd(a_int))
-            time.sleep(TIMEOUT)
-        # (2) AUTHORIZE
-        frame = driver.cd1(pump_id, DccCmd.AUTHORIZE)
-        logger.debug(f"Raw frame after AUTHORIZE: {frame.hex()}")
-        parsed = cls._parse_dc1(frame)
+        with span("authorize"):
+            if volume is not None:
+                v_int = int(volume * 10**DecimalConfig.VOLUME.value)
+                driver.cd3_preset_volume(pump_id, int_to_bcd(v_int))
+                with span("preset_wait"):
+                    time.sleep(TIMEOUT)
+            if amount is not None:
+                a_int = int(amount * 10**DecimalConfig.AMOUNT.value)
+                driver.cd4_preset_amount(pump_id, int_to_bcd(a_int))
+                with span("preset_wait"):
+                    time.sleep(TIMEOUT)
+            # (2) AUTHORIZE
+            frame = driver.cd1(pump_id, DccCmd.AUTHORIZE)
+            logger.debug(f"Raw frame after AUTHORIZE: {frame.hex()}")
+            with span("parse"):
+                parsed = cls._parse_dc1(frame)
         logger.info(f"Parsed authorize response: {parsed}")
         return parsed
 
+    @classmethod
+    def _command(cls, pump_id: int, dcc: DccCmd) -> dict:
+        with span(dcc.name.lower()):
+            frame = driver.cd1(pump_id, dcc)
+            with span("parse"):
+                return cls._parse_dc1(frame)
+
     @classmethod
     def stop(cls, pump_id: int):
-        frame = driver.cd1(pump_id, DccCmd.STOP)
-        return cls._parse_dc1(frame)
+        return cls._command(pump_id, DccCmd.STOP)
 
     @classmethod
     def reset(cls, pump_id: int):
-        frame = driver.cd1(pump_id, DccCmd.RESET)
-        return cls._parse_dc1(frame)
+        return cls._command(pump_id, DccCmd.RESET)
     
     @classmethod
     def switch_off(cls, pump_id: int):
-        frame = driver.cd1(pump_id, DccCmd.SWITCH_OFF)
-        return cls._parse_dc1(frame)
\ No newline at end of file
+        return cls._command(pump_id, DccCmd.SWITCH_OFF)
+
+    @classmethod
+    def batch(cls, commands: List[dict]) -> List[dict]:
+        """
+        Групповые команды за один проход по шине.
+        commands – [{"pump_id", "command": DccCmd, "volume"?, "amount"?}].
+        Команды сортируются по приоритету (STOP/SWITCH_OFF → RESET → пресеты →
+        AUTHORIZE) и уходят одним DartDriver.sweep (линия RS-485 пока одна).
+        Результаты – в порядке commands.
+        Одна колонка – одна команда: иначе сортировка по приоритету могла бы
+        переставить, например, authorize после stop (ValueError).
+        """
+        seen = set()
+        for c in commands:
+            if c["pump_id"] in seen:
+                raise ValueError(f"Колонка {c['pump_id']} указана в пачке больше одного раза")
+            seen.add(c["pump_id"])
+            if c.get("volume") is not None and c.get("amount") is not None:
+                raise ValueError(f"Колонка {c['pump_id']}: укажите либо volume, либо amount")
+            if (c.get("volume") is not None or c.get("amount") is not None) \
+                    and c["command"] != DccCmd.AUTHORIZE:
+                raise ValueError(f"Колонка {c['pump_id']}: пресет допустим только для authorize")
+
+        with span("batch"):
+            groups: Dict[int, list] = {}   # приоритет → [(addr, blocks, index команды | None)]
+            presets: Dict[int, tuple] = {}  # index команды → (группа, позиция) её пресета
+            for i, c in enumerate(commands):
+                addr = 0x50 + c["pump_id"]
+                dcc = DccCmd(c["command"])
+                preset = None
+                if c.get("volume") is not None:
+                    v_int = int(c["volume"] * 10**DecimalConfig.VOLUME.value)
+                    preset = bytes([DartTrans.CD3, 0x04]) + int_to_bcd(v_int)
+                elif c.get("amount") is not None:
+                    a_int = int(c["amount"] * 10**DecimalConfig.AMOUNT.value)
+                    preset = bytes([DartTrans.CD4, 0x04]) + int_to_bcd(a_int)
+                if preset is not None:
+                    group = groups.setdefault(2, [])
+                    presets[i] = (2, len(group))
+                    group.append((addr, [preset], None))
+                groups.setdefault(_BATCH_PRIORITY[dcc], []).append(
+                    (addr, [bytes([DartTrans.CD1, 0x01, dcc])], i))
+
+            order = sorted(groups)
+            pos = {p: n for n, p in enumerate(order)}
+            # AUTHORIZE уходит только после подтверждённого пресета этой колонки
+            sweep = [[(addr, blocks,
+                       (((pos[presets[i][0]], presets[i][1]),) if i in presets else ()))
+                      for addr, blocks, i in groups[p]]
+                     for p in order]
+            replies = driver.sweep(sweep)
+
+            results: List[dict] = [{} for _ in commands]
+            for p, group_replies in zip(order, replies):
+                for (_, _, i), frame in zip(groups[p], group_replies):
+                    if i is None:
+                        continue
+                    c = commands[i]
+                    if frame is None:
+                        error = "Preset not acknowledged"
+                        parsed = {}
+                    else:
+                        with span("parse"):
+                            parsed = cls._parse_dc1(frame) if frame else {}
+                        error = None if parsed else "No response or invalid frame"
+                    results[i] = {
+                        "pump_id": c["pump_id"],
+                        "command": DccCmd(c["command"]).name.lower(),
+                        "ok": bool(parsed),
+                        "status": _status_name(parsed.get("status")),
+                        "error": error,
+                    }
+        return results
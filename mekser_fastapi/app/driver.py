@@ -10,7 +10,7 @@ from __future__ import annotations
 import threading
 import time
 import logging
-from typing import List
+from typing import List, Optional, Tuple
 
 import serial
 
@@ -25,6 +25,7 @@ from .config import (
     CRC_POLY,
 )
 from .enums import DartTrans
+from .tracing import span, incr
 
 _log = logging.getLogger("mekser.driver")
 
@@ -78,7 +79,81 @@ class DartDriver:
         if timeout is None:
             timeout = TIMEOUT
 
-        # Собираем кадр
+        frame = self._pack(addr, trans_blocks)
+
+        with span("transact"):
+            with span("lock"):
+                self._lock.acquire()
+            try:
+                for attempt in range(3):
+                    if attempt:
+                        incr("retry")
+                        with span("backoff"):
+                            time.sleep(0.1)
+                    buf = self._exchange(frame, timeout, attempt)
+                    if buf:
+                        return buf
+            finally:
+                self._lock.release()
+
+        _log.error("Failed to receive valid frame after 3 retries")
+        return b""
+
+    def sweep(self, groups: List[List[Tuple[int, List[bytes], Tuple[Tuple[int, int], ...]]]],
+              timeout: float = None) -> List[List[Optional[bytes]]]:
+        """
+        Групповая отправка за один захват линии.
+        groups – список групп по убыванию приоритета, группа – [(addr, блоки L3, after)],
+        after – ссылки (группа, индекс) на кадры из предыдущих групп, без ответа
+        на которые этот кадр не отправляется (например, AUTHORIZE после пресета).
+        Кадры группы идут подряд без пауз; не ответившие повторяются следующими
+        проходами (до 3 попыток), и только потом линия переходит к следующей группе.
+        Возвращает ответы в той же структуре: b"" – ответа нет, None – кадр пропущен.
+        """
+        if timeout is None:
+            timeout = TIMEOUT
+
+        results: List[List[Optional[bytes]]] = [[b""] * len(group) for group in groups]
+        frames: List[List[Optional[bytes]]] = [[None] * len(group) for group in groups]
+
+        with span("sweep"):
+            with span("lock"):
+                self._lock.acquire()
+            try:
+                for g, group in enumerate(groups):
+                    pending = []
+                    for i, (addr, blocks, after) in enumerate(group):
+                        if all(results[dg][di] for dg, di in after):
+                            pending.append(i)
+                        else:
+                            results[g][i] = None
+                            _log.warning(f"Sweep: frame to {addr:#04x} skipped, prerequisite not acknowledged")
+                    for attempt in range(3):
+                        if not pending:
+                            break
+                        if attempt:
+                            incr("retry", len(pending))
+                            with span("backoff"):
+                                time.sleep(0.1)       # одна пауза на проход, не на кадр
+                        failed = []
+                        for i in pending:
+                            if frames[g][i] is None:  # SEQ переключаем только для реально отправленных
+                                frames[g][i] = self._pack(group[i][0], group[i][1])
+                            results[g][i] = self._exchange(frames[g][i], timeout, attempt)
+                            if not results[g][i]:
+                                failed.append(i)
+                        pending = failed
+                    for i in pending:
+                        _log.error(f"Sweep: no valid frame from {group[i][0]:#04x} after 3 attempts")
+            finally:
+                self._lock.release()
+
+        return results
+
+
+    # ────────── приватка ──────────
+    def _pack(self, addr: int, trans_blocks: List[bytes]) -> bytes:
+        """Кадр STX ADR CTRL SEQ LNG … CRC-L CRC-H ETX SF; переключает SEQ."""
         body = b"".join(trans_blocks)
         lng = len(body)
         ctrl = 0xF0                      # 1111 0000 – Host, DATA
@@ -91,59 +166,59 @@ class DartDriver:
 
         frame = bytes([self.STX]) + hdr + crc_bytes + bytes([self.ETX, self.SF])
         _log.debug(f"TX frame: {frame.hex()}")
+        return frame
 
-        attempts = 0
-        with self._lock:
-            while attempts < 3:
-                self._ser.reset_input_buffer()
-                self._ser.write(frame)
-                self._ser.flush()
-
-                start = time.time()
-                buf = bytearray()
-                # Читаем пока не встретим ETX или не выйдет таймаут
-                while time.time() - start < timeout:
-                    chunk = self._ser.read(self._ser.in_waiting or 1)
-                    if chunk:
-                        buf += chunk
-                        if self.ETX in chunk:
-                            # дочитываем SF, если надо
-                            if buf[-1] != self.SF:
-                                buf += self._ser.read(1)
-                            break
-
-                if not buf:
-                    _log.error(f"No response received (attempt {attempts+1}/3)")
-                    attempts += 1
-                    time.sleep(0.1)
-                    continue
-
-                # Фаза CRC-0 верификации: регион от ADR до CRC-H включительно
-                try:
-                    stx = buf.index(self.STX)
-                    etx = buf.index(self.ETX, stx + 1)
-                    # берем байты [ADR…CRC-H]
-                    crc_region = buf[stx+1 : etx-1]  # ADR…CRC-H
-                    crc0 = calc_crc(crc_region)
-                    if crc0 != 0:
-                        _log.error(f"CRC-0 validation FAILED: calc={crc0:04X}, frame={buf.hex()}")
-                        attempts += 1
-                        time.sleep(0.1)
-                        continue
-                except ValueError:
-                    _log.error(f"Malformed frame (no STX/ETX) on attempt {attempts+1}")
-                    attempts += 1
-                    time.sleep(0.1)
-                    continue
-
-                _log.debug(f"RX frame: {buf.hex()}")
-                return bytes(buf)
-
-        _log.error("Failed to receive valid frame after 3 retries")
-        return b""
+    def _exchange(self, frame: bytes, timeout: float, attempt: int) -> bytes:
+        """
+        Одна попытка: запись кадра и приём ответа с CRC-0 проверкой.
+        Вызывать только под self._lock. b"" – ответа нет или он битый.
+        """
+        with span("write"):
+            self._ser.reset_input_buffer()
+            self._ser.write(frame)
+            self._ser.flush()
 
+        with span("rx"):
+            start = time.time()
+            buf = bytearray()
+            # Читаем пока не встретим ETX или не выйдет таймаут
+            while time.time() - start < timeout:
+                chunk = self._ser.read(self._ser.in_waiting or 1)
+                if chunk:
+                    buf += chunk
+                    if self.ETX in chunk:
+                        # дочитываем SF, если надо
+                        if buf[-1] != self.SF:
+                            buf += self._ser.read(1)
+                        break
+
+        if not buf:
+            _log.error(f"No response received (attempt {attempt+1}/3)")
+            incr("no_response")
+            return b""
+
+        # Фаза CRC-0 верификации: регион от ADR до CRC-H включительно
+        with span("crc"):
+            try:
+                stx = buf.index(self.STX)
+                etx = buf.index(self.ETX, stx + 1)
+                # берем байты [ADR…CRC-H]
+                crc_region = buf[stx+1 : etx-1]  # ADR…CRC-H
+                crc0 = calc_crc(crc_region)
+            except ValueError:
+                crc0 = None
+        if crc0 is None:
+            _log.error(f"Malformed frame (no STX/ETX) on attempt {attempt+1}")
+            incr("malformed")
+            return b""
+        if crc0 != 0:
+            _log.error(f"CRC-0 validation FAILED: calc={crc0:04X}, frame={buf.hex()}")
+            incr("crc_error")
+            return b""
+
+        _log.debug(f"RX frame: {buf.hex()}")
+        return bytes(buf)
 
-    # ────────── приватка ──────────
     def _build_frame(self, addr: int, blocks: List[bytes]) -> bytes:
         """
         addr  – байт адреса 0x50…0x6F
@@ -0,0 +1,193 @@
+"""
+history.py – ограниченная по памяти история состояний колонок.
+
+На каждую колонку – кольцевой буфер из array-колонок фиксированной ёмкости
+(ts, status, volume, amount, alarm ≈ 27 байт на отсчёт). Отсчёт пишется,
+только если что-то изменилось, либо раз в HISTORY_HEARTBEAT секунд –
+так значение в момент t = последний отсчёт с ts ≤ t.
+Наполняется из PumpService.return_status (WebSocket, API, фоновый опрос
+HISTORY_POLL_INTERVAL) – своих запросов в шину история не делает.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, List, Optional
+
+from .config import HISTORY_CAPACITY, HISTORY_HEARTBEAT
+from .enums import PumpStatus
+
+_log = logging.getLogger("mekser.history")
+
+NO_VALUE = -1          # маркер “нет данных” для status/alarm
+_NAN = float("nan")    # маркер “нет данных” для volume/amount
+
+
+class _Ring:
+    """Кольцевой буфер отсчётов одной колонки (колонки – array)."""
+
+    __slots__ = ("cap", "head", "size", "ts", "status", "volume", "amount", "alarm")
+
+    def __init__(self, cap: int):
+        self.cap = cap
+        self.head = 0                      # куда писать следующий отсчёт
+        self.size = 0
+        self.ts = array("d", bytes(8 * cap))
+        self.status = array("b", bytes(cap))
+        self.volume = array("d", bytes(8 * cap))
+        self.amount = array("d", bytes(8 * cap))
+        self.alarm = array("h", bytes(2 * cap))
+
+    def append(self, ts: float, status: int, volume: float, amount: float, alarm: int) -> None:
+        i = self.head
+        self.ts[i] = ts
+        self.status[i] = status
+        self.volume[i] = volume
+        self.amount[i] = amount
+        self.alarm[i] = alarm
+        self.head = (i + 1) % self.cap
+        if self.size < self.cap:
+            self.size += 1
+
+    def last(self) -> Optional[tuple]:
+        if not self.size:
+            return None
+        i = (self.head - 1) % self.cap
+        return self.ts[i], self.status[i], self.volume[i], self.amount[i], self.alarm[i]
+
+    def ordered(self, col: array) -> array:
+        """Колонка в хронологическом порядке (копия)."""
+        if self.size < self.cap:
+            return col[:self.size]
+        return col[self.head:] + col[:self.head]
+
+
+def _same(a: float, b: float) -> bool:
+    return a == b or (a != a and b != b)   # NaN == NaN
+
+
+def _sample(ts: float, status: int, volume: float, amount: float, alarm: int) -> dict:
+    return {
+        "ts": ts,
+        "status": PumpStatus(status).name if status != NO_VALUE else None,
+        "volume": volume if volume == volume else None,
+        "amount": amount if amount == amount else None,
+        "alarm": alarm if alarm != NO_VALUE else None,
+    }
+
+
+# слушатель изменений: (pump_id, новый отсчёт, предыдущий отсчёт | None)
+Listener = Callable[[int, dict, Optional[dict]], None]
+
+
+class HistoryStore:
+    """Потокобезопасное хранилище истории всех колонок."""
+
+    def __init__(self, capacity: int = HISTORY_CAPACITY, heartbeat: float = HISTORY_HEARTBEAT):
+        self._capacity = capacity
+        self._heartbeat = heartbeat
+        self._rings: Dict[int, _Ring] = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Listener] = []
+
+    def subscribe(self, listener: Listener) -> None:
+        """Получать каждое изменение состояния (heartbeat-отсчёты не передаются)."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Listener) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def record(self, pump_id: int, data: dict, ts: float | None = None) -> bool:
+        """
+        Принять разобранный ответ колонки (формат PumpService._parse_frame).
+        Возвращает True, если отсчёт записан.
+        """
+        if not data:
+            return False
+        status = data.get("status")
+        if isinstance(status, str):
+            status = PumpStatus[status].value if status in PumpStatus.__members__ else NO_VALUE
+        elif status is None:
+            status = NO_VALUE
+        volume = data.get("volume", _NAN)
+        amount = data.get("amount", _NAN)
+        alarm = data.get("alarm", NO_VALUE)
+        with self._lock:
+            ring = self._rings.get(pump_id)
+            if ring is None:
+                ring = self._rings[pump_id] = _Ring(self._capacity)
+            last = ring.last()
+            # время берём под блокировкой и не даём ему идти назад –
+            # query() ищет окно бинарным поиском по ts
+            if ts is None:
+                ts = time.time()
+            if last is not None and ts < last[0]:
+                ts = last[0]
+            changed = (last is None
+                       or last[1] != status or last[4] != alarm
+                       or not _same(last[2], volume) or not _same(last[3], amount))
+            if not changed and ts - last[0] < self._heartbeat:
+                return False
+            ring.append(ts, status, volume, amount, alarm)
+        if changed and self._listeners:
+            sample = _sample(ts, status, volume, amount, alarm)
+            prev = _sample(*last) if last is not None else None
+            for listener in list(self._listeners):
+                try:
+                    listener(pump_id, sample, prev)
+                except Exception:
+                    _log.exception(f"History listener failed for pump {pump_id}")
+        return True
+
+    def query(self, pump_id: int, start: float, end: float,
+              step: float | None = None) -> List[dict]:
+        """
+        Отсчёты в [start, end]. При step > 0 – даунсэмплинг по корзинам
+        [start + k*step, start + (k+1)*step): берётся последнее состояние
+        в корзине, alarm – максимальный код за корзину. Пустые корзины пропускаются.
+        Бесконечные/NaN границы и шаг – ValueError.
+        """
+        if not (math.isfinite(start) and math.isfinite(end)) or (step and not math.isfinite(step)):
+            raise ValueError("start, end and step must be finite")
+        with self._lock:
+            ring = self._rings.get(pump_id)
+            if ring is None:
+                return []
+            ts = ring.ordered(ring.ts)
+            lo = bisect_left(ts, start)
+            hi = bisect_right(ts, end)
+            if lo >= hi:
+                return []
+            ts = ts[lo:hi]
+            status = ring.ordered(ring.status)[lo:hi]
+            volume = ring.ordered(ring.volume)[lo:hi]
+            amount = ring.ordered(ring.amount)[lo:hi]
+            alarm = ring.ordered(ring.alarm)[lo:hi]
+
+        if not step or step <= 0:
+            idx = range(len(ts))
+            alarms = alarm
+        else:
+            idx, alarms = [], []
+            bucket = None
+            for i, t in enumerate(ts):
+                b = int((t - start) // step)
+                if b != bucket:
+                    bucket = b
+                    idx.append(i)
+                    alarms.append(alarm[i])
+                else:
+                    idx[-1] = i
+                    alarms[-1] = max(alarms[-1], alarm[i])
+
+        return [_sample(ts[i], status[i], volume[i], amount[i], alarms[n])
+                for n, i in enumerate(idx)]
+
+
+history = HistoryStore()  # singleton
@@ -1,9 +1,11 @@
 import logging
 import asyncio
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from app.api import router as pump_router
-from app.config import DEFAULT_PUMP_IDS, WS_POLL_INTERVAL
+from app.config import DEFAULT_PUMP_IDS, WS_POLL_INTERVAL, HISTORY_POLL_INTERVAL, OUTBOX_URL
 from app.core import PumpService
+from app import tracing
+from app.outbox import outbox
 
 # Логирование
 logging.basicConfig(
@@ -22,13 +24,52 @@ app.include_router(pump_router)
 from .ws import router as ws_router
 app.include_router(ws_router)
 
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """
+    Трасса на каждый HTTP-запрос: разбивка времени (lock/write/rx/crc/parse…)
+    уходит клиенту в заголовке Server-Timing.
+    """
+    token = tracing.begin(f"{request.method} {request.url.path}")
+    try:
+        response = await call_next(request)
+    finally:
+        timing = tracing.finish(token)
+    if timing:
+        response.headers["Server-Timing"] = timing
+    return response
+
+_history_task: asyncio.Task | None = None
+
+async def _poll_history(interval: float):
+    """Фоновый опрос статусов – наполняет историю (app.history) без клиентов WS."""
+    while True:
+        for pump_id in DEFAULT_PUMP_IDS:
+            try:
+                await asyncio.to_thread(PumpService.return_status, pump_id)
+            except Exception:
+                logger.exception(f"History poll failed for pump {pump_id}")
+        await asyncio.sleep(interval)
+
 @app.on_event("startup")
 async def on_startup():
+    global _history_task
     logger.info("FastAPI startup")
+    if HISTORY_POLL_INTERVAL > 0:
+        _history_task = asyncio.create_task(_poll_history(HISTORY_POLL_INTERVAL))
+    if OUTBOX_URL:
+        outbox.start()
+        # outbox сам шину не опрашивает – только пересылает уже прочитанные статусы
+        if HISTORY_POLL_INTERVAL <= 0:
+            logger.warning("Outbox enabled but MEKSER_HISTORY_POLL_INTERVAL is 0: "
+                           "events are shipped only while WebSocket/API clients read statuses")
 
 @app.on_event("shutdown")
 async def on_shutdown():
     logger.info("FastAPI shutdown")
+    if _history_task is not None:
+        _history_task.cancel()
+    outbox.stop()
 
 @app.websocket("/ws/events")
 async def pump_events(websocket: WebSocket):
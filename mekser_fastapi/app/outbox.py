@@ -0,0 +1,261 @@
+"""
+outbox.py – store-and-forward выгрузка событий в головной офис.
+
+* события берутся из истории состояний (app.history): outbox сам шину не
+  опрашивает, а пересылает то, что уже прочитали WebSocket/API или фоновый
+  опрос HISTORY_POLL_INTERVAL;
+* каждое событие сразу пишется в локальный SQLite (переживает рестарт и
+  обрыв сети), отправка – отдельным потоком;
+* пачка уходит, когда набралось OUTBOX_BATCH_MAX событий / OUTBOX_BATCH_BYTES
+  байт, либо раз в OUTBOX_FLUSH_INTERVAL секунд: POST gzip-JSON на OUTBOX_URL;
+* после 2xx отправленные строки удаляются; при сетевой ошибке, 5xx и 429 –
+  повтор той же пачки с экспоненциальной паузой до OUTBOX_MAX_BACKOFF;
+  прочие 4xx – пачка отклонена навсегда: она переносится в таблицу rejected
+  (dead-letter), чтобы не останавливать очередь.
+
+Тело запроса: {"source": …, "events": [{"id", "ts", "kind", "pump_id", …}]}.
+id события монотонен – получатель может отбрасывать повторы.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from typing import List, Optional, Tuple
+
+from .config import (
+    OUTBOX_URL,
+    OUTBOX_DB,
+    OUTBOX_SOURCE,
+    OUTBOX_BATCH_MAX,
+    OUTBOX_BATCH_BYTES,
+    OUTBOX_FLUSH_INTERVAL,
+    OUTBOX_MAX_BACKOFF,
+    OUTBOX_MAX_EVENTS,
+    OUTBOX_HTTP_TIMEOUT,
+)
+from .enums import PumpStatus
+from .history import history
+
+_log = logging.getLogger("mekser.outbox")
+
+# статусы, переход в которые означает законченный налив
+_FILL_DONE = {PumpStatus.FILLING_COMPLETE.name, PumpStatus.PRESET_REACHED.name}
+
+
+class Outbox:
+    """Локальная очередь событий + поток отправки."""
+
+    def __init__(self, url: str = OUTBOX_URL, db_path: str = OUTBOX_DB):
+        self.url = url
+        self.db_path = db_path
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = 0          # событий в очереди
+        self._pending_bytes = 0    # их суммарный размер (до сжатия)
+
+    # ────────── жизненный цикл ──────────
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rejected ("
+            " id INTEGER PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " http_status INTEGER NOT NULL)"
+        )
+        self._db.commit()
+        self._pending, self._pending_bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM events"
+        ).fetchone()
+        if self._pending:
+            _log.info(f"Outbox: resuming with {self._pending} unsent events")
+
+        history.subscribe(self.on_state)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mekser-outbox", daemon=True)
+        self._thread.start()
+        _log.info(f"Outbox started → {self.url} (db={self.db_path})")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is None:
+            return
+        history.unsubscribe(self.on_state)
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+        with self._lock:
+            self._db.close()
+            self._db = None
+        _log.info("Outbox stopped")
+
+    # ────────── приём событий ──────────
+    def on_state(self, pump_id: int, sample: dict, prev: Optional[dict]) -> None:
+        """
+        Слушатель history: каждое изменение → "state", конец налива → "fill".
+        fill – только на увиденном переходе: история живёт в памяти, и после
+        рестарта первый отсчёт колонки, всё ещё стоящей в FILLING_COMPLETE,
+        не должен повторно выгрузить уже учтённый налив.
+        """
+        self.enqueue("state", pump_id, sample)
+        status = sample.get("status")
+        if status in _FILL_DONE and prev is not None and prev["status"] != status:
+            self.enqueue("fill", pump_id, {"ts": sample["ts"],
+                                           "status": status,
+                                           "volume": sample.get("volume"),
+                                           "amount": sample.get("amount")})
+
+    def enqueue(self, kind: str, pump_id: int, data: dict) -> None:
+        payload = json.dumps({"kind": kind, "pump_id": pump_id, **data},
+                             separators=(",", ":"))
+        with self._lock:
+            if self._db is None:
+                return
+            self._db.execute("INSERT INTO events (payload) VALUES (?)", (payload,))
+            self._pending += 1
+            self._pending_bytes += len(payload)
+            if self._pending > OUTBOX_MAX_EVENTS:
+                self._trim()
+            self._db.commit()
+            full = self._pending >= OUTBOX_BATCH_MAX or self._pending_bytes >= OUTBOX_BATCH_BYTES
+        if full:
+            self._wake.set()
+
+    def _trim(self) -> None:
+        """Переполнение локальной очереди – теряем самые старые события."""
+        excess = self._pending - OUTBOX_MAX_EVENTS
+        dropped_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM"
+            " (SELECT payload FROM events ORDER BY id LIMIT ?)", (excess,)
+        ).fetchone()[0]
+        self._db.execute(
+            "DELETE FROM events WHERE id IN (SELECT id FROM events ORDER BY id LIMIT ?)",
+            (excess,),
+        )
+        self._pending -= excess
+        self._pending_bytes -= dropped_bytes
+        _log.warning(f"Outbox full: dropped {excess} oldest events")
+
+    # ────────── отправка ──────────
+    def _run(self) -> None:
+        backoff = 0.0
+        while not self._stop.is_set():
+            if backoff:
+                self._stop.wait(backoff)      # в паузе после ошибки не будим по объёму
+            else:
+                self._wake.wait(OUTBOX_FLUSH_INTERVAL)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            while True:
+                batch = self._next_batch()
+                if not batch:
+                    backoff = 0.0
+                    break
+                if not self._ship(batch):
+                    backoff = min(max(backoff * 2, 1.0), OUTBOX_MAX_BACKOFF)
+                    break
+                self._ack(batch)
+                backoff = 0.0
+                # хвост меньше порога дождётся следующего интервала
+                if self._pending < OUTBOX_BATCH_MAX and self._pending_bytes < OUTBOX_BATCH_BYTES:
+                    break
+
+    def _next_batch(self) -> List[Tuple[int, str]]:
+        with self._lock:
+            if self._db is None:
+                return []
+            rows = self._db.execute(
+                "SELECT id, payload FROM events ORDER BY id LIMIT ?", (OUTBOX_BATCH_MAX,)
+            ).fetchall()
+        batch, size = [], 0
+        for row_id, payload in rows:
+            if batch and size + len(payload) > OUTBOX_BATCH_BYTES:
+                break
+            batch.append((row_id, payload))
+            size += len(payload)
+        return batch
+
+    def _ship(self, batch: List[Tuple[int, str]]) -> bool:
+        """
+        Отправить пачку. True – пачку можно снять с очереди (доставлена или
+        отклонена получателем и перенесена в rejected), False – повторить позже.
+        """
+        events = [{"id": row_id, **json.loads(payload)} for row_id, payload in batch]
+        body = gzip.compress(
+            json.dumps({"source": OUTBOX_SOURCE, "events": events},
+                       separators=(",", ":")).encode()
+        )
+        req = urllib.request.Request(
+            self.url,
+            data=body,
+            method="POST",
+            headers={
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+                "X-Outbox-Batch": f"{batch[0][0]}-{batch[-1][0]}",
+            },
+        )
+        ids = f"{batch[0][0]}-{batch[-1][0]}"
+        try:
+            with urllib.request.urlopen(req, timeout=OUTBOX_HTTP_TIMEOUT) as resp:
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception as e:
+            _log.warning(f"Outbox: batch {ids} not delivered: {e}")
+            return False
+        if 200 <= status < 300:
+            _log.debug(f"Outbox: sent {len(batch)} events ({len(body)} bytes gzip)")
+            return True
+        if 400 <= status < 500 and status != 429:
+            _log.error(f"Outbox: batch {ids} rejected with HTTP {status}, moved to dead-letter")
+            self._dead_letter(batch, status)
+            return True
+        _log.warning(f"Outbox: batch {ids} not delivered: HTTP {status}")
+        return False
+
+    def _dead_letter(self, batch: List[Tuple[int, str]], http_status: int) -> None:
+        """Отклонённая пачка – в таблицу rejected (не больше OUTBOX_MAX_EVENTS строк)."""
+        with self._lock:
+            if self._db is None:
+                return
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rejected (id, payload, http_status) VALUES (?, ?, ?)",
+                [(row_id, payload, http_status) for row_id, payload in batch],
+            )
+            self._db.execute(
+                "DELETE FROM rejected WHERE id NOT IN"
+                " (SELECT id FROM rejected ORDER BY id DESC LIMIT ?)", (OUTBOX_MAX_EVENTS,)
+            )
+            self._db.commit()
+
+    def _ack(self, batch: List[Tuple[int, str]]) -> None:
+        with self._lock:
+            if self._db is None:
+                return
+            self._db.execute("DELETE FROM events WHERE id <= ?", (batch[-1][0],))
+            self._db.commit()
+            self._pending, self._pending_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM events"
+            ).fetchone()
+
+
+outbox = Outbox()  # singleton; запускается в main при заданном OUTBOX_URL
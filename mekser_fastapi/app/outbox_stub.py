@@ -0,0 +1,65 @@
+"""
+outbox_stub.py – локальный приёмник для проверки outbox.
+
+    python -m app.outbox_stub 8081
+    MEKSER_OUTBOX_URL=http://127.0.0.1:8081/ingest uvicorn app.main:app
+
+Распаковывает gzip-пачки, печатает события и отвечает 204.
+Повторно присланные события (id ≤ последнего принятого) отмечаются как дубли.
+"""
+
+import gzip
+import json
+import logging
+import sys
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("mekser.outbox_stub")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    last_id = 0
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            if self.headers.get("Content-Encoding") == "gzip":
+                raw = gzip.decompress(raw)
+        except (OSError, EOFError, zlib.error):
+            self.send_error(400, "Invalid gzip body")
+            return
+        try:
+            batch = json.loads(raw)
+        except ValueError:
+            self.send_error(400, "Invalid JSON")
+            return
+        events = batch.get("events", [])
+        fresh = [e for e in events if e.get("id", 0) > _Handler.last_id]
+        logger.info(f"Batch {self.headers.get('X-Outbox-Batch')} from {batch.get('source')}: "
+                    f"{len(events)} events, {len(events) - len(fresh)} duplicates")
+        for e in fresh:
+            logger.info(f"  {e}")
+        if fresh:
+            _Handler.last_id = fresh[-1]["id"]
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO,
+                        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    logger.info(f"Outbox stub listening on http://127.0.0.1:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
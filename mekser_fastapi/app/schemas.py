@@ -1,5 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
+from app.config import DEFAULT_PUMP_IDS
+from app.enums import DecimalConfig
 
 class PumpStatusOut(BaseModel):
     status:        str
@@ -12,4 +14,43 @@ class PumpStatusOut(BaseModel):
 
 class PresetIn(BaseModel):
     volume: Optional[float] = Field(None, gt=0, description="Литры")
-    amount: Optional[float] = Field(None, gt=0, description="Сумма")
\ No newline at end of file
+    amount: Optional[float] = Field(None, gt=0, description="Сумма")
+
+class HistorySampleOut(BaseModel):
+    ts:            float = Field(..., description="Unix-время отсчёта, с")
+    status:        str | None = None
+    volume:        float | None = None
+    amount:        float | None = None
+    alarm:         int   | None = None
+
+class PumpHistoryOut(BaseModel):
+    pump_id:       int
+    start:         float = Field(..., description="Начало интервала (from), Unix-время")
+    end:           float = Field(..., description="Конец интервала (to), Unix-время")
+    step:          float | None = Field(None, description="Шаг даунсэмплинга, с")
+    samples:       List[HistorySampleOut]
+
+
+# пресет CD3/CD4 – 4 байта BCD, т.е. не больше 8 цифр с учётом десятичных
+_MAX_VOLUME = (10**8 - 1) / 10**DecimalConfig.VOLUME.value
+_MAX_AMOUNT = (10**8 - 1) / 10**DecimalConfig.AMOUNT.value
+
+class BatchCommandIn(BaseModel):
+    pump_id:       int = Field(..., ge=1, le=len(DEFAULT_PUMP_IDS))
+    command:       Literal["stop", "switch_off", "reset", "authorize"]
+    volume:        Optional[float] = Field(None, gt=0, le=_MAX_VOLUME,
+                                           description="Пресет, литры (authorize)")
+    amount:        Optional[float] = Field(None, gt=0, le=_MAX_AMOUNT,
+                                           description="Пресет, сумма (authorize)")
+
+class BatchIn(BaseModel):
+    # одна команда на колонку, а вся пачка держит DartDriver._lock
+    commands:      List[BatchCommandIn] = Field(..., min_length=1,
+                                                max_length=len(DEFAULT_PUMP_IDS))
+
+class BatchResultOut(BaseModel):
+    pump_id:       int
+    command:       str
+    ok:            bool
+    status:        str | None = None
+    error:         str | None = None
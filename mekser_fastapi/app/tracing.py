@@ -0,0 +1,139 @@
+"""
+tracing.py – лёгкие спаны на запрос (api → PumpService → DartDriver.transact).
+
+* каждый HTTP-запрос получает Trace в contextvar, спаны копят суммарное
+  время по имени → заголовок Server-Timing;
+* для сэмплированных запросов дополнительно пишется полное дерево спанов,
+  и если запрос дольше TRACE_SLOW_MS – дерево уходит в лог mekser.trace;
+* вне запроса (WebSocket-опрос, фоновые задачи) span() – пустой no-op.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import TRACE_ENABLED, TRACE_SAMPLE_RATE, TRACE_SLOW_MS
+
+_log = logging.getLogger("mekser.trace")
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar(
+    "mekser_trace", default=None
+)
+
+
+class Trace:
+    """
+    Трасса одного запроса.
+    totals – {имя: [суммарные мс, число вызовов]} (всегда);
+    spans  – [(глубина, имя, старт мс, длительность мс)] (только при сэмплинге).
+    """
+
+    __slots__ = ("name", "sampled", "start", "totals", "counters", "spans", "_depth")
+
+    def __init__(self, name: str, sampled: bool = False):
+        self.name = name
+        self.sampled = sampled
+        self.start = time.perf_counter()
+        self.totals: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.spans: List[Tuple[int, str, float, float]] = []
+        self._depth = 0
+
+    def add(self, name: str, dur_ms: float) -> None:
+        tot = self.totals.get(name)
+        if tot is None:
+            self.totals[name] = [dur_ms, 1]
+        else:
+            tot[0] += dur_ms
+            tot[1] += 1
+
+    def incr(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def server_timing(self, total_ms: float) -> str:
+        """Значение заголовка Server-Timing (RFC: name;dur=…;desc=…)."""
+        parts = [f'{name};dur={ms:.2f};desc="n={cnt}"'
+                 for name, (ms, cnt) in self.totals.items()]
+        parts += [f'{name};desc="{cnt}"' for name, cnt in self.counters.items()]
+        parts.append(f"total;dur={total_ms:.2f}")
+        return ", ".join(parts)
+
+    def render_tree(self) -> str:
+        lines = [f"{self.name} {self.elapsed_ms():.2f} ms"]
+        for depth, name, offset, dur in self.spans:
+            lines.append(f"{'  ' * (depth + 1)}{name} +{offset:.2f} ms {dur:.2f} ms")
+        if self.counters:
+            lines.append("  counters: " + ", ".join(f"{k}={v}" for k, v in self.counters.items()))
+        return "\n".join(lines)
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Замер участка кода; без активной трассы почти ничего не стоит."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    if not trace.sampled:
+        try:
+            yield
+        finally:
+            trace.add(name, (time.perf_counter() - t0) * 1000)
+        return
+    # сэмплированный запрос: резервируем место, чтобы дерево шло в порядке старта
+    idx = len(trace.spans)
+    depth = trace._depth
+    trace.spans.append((depth, name, (t0 - trace.start) * 1000, 0.0))
+    trace._depth = depth + 1
+    try:
+        yield
+    finally:
+        dur = (time.perf_counter() - t0) * 1000
+        trace._depth = depth
+        trace.spans[idx] = (depth, name, (t0 - trace.start) * 1000, dur)
+        trace.add(name, dur)
+
+
+def incr(name: str, n: int = 1) -> None:
+    """Счётчик событий (ретраи, CRC-ошибки…) в текущей трассе."""
+    trace = _current.get()
+    if trace is not None:
+        trace.incr(name, n)
+
+
+def begin(name: str) -> Optional[contextvars.Token]:
+    """Открыть трассу запроса. None – трассировка выключена в конфиге."""
+    if not TRACE_ENABLED:
+        return None
+    sampled = TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+    return _current.set(Trace(name, sampled))
+
+
+def finish(token: Optional[contextvars.Token]) -> Optional[str]:
+    """
+    Закрыть трассу, при необходимости залогировать медленный запрос.
+    Возвращает значение Server-Timing либо None.
+    """
+    if token is None:
+        return None
+    trace = _current.get()
+    _current.reset(token)
+    if trace is None:
+        return None
+    total = trace.elapsed_ms()
+    if trace.sampled and total >= TRACE_SLOW_MS:
+        _log.warning(f"Slow request ({total:.2f} ms >= {TRACE_SLOW_MS} ms):\n{trace.render_tree()}")
+    return trace.server_timing(total)
@@ -0,0 +1,84 @@
+"""
+Общие фикстуры тестов.
+
+app.driver открывает последовательный порт прямо при импорте, поэтому до
+импорта app модуль serial подменяется эмулятором линии: FakeSerial отвечает
+на каждый записанный кадр тем, что тест положил в replies[addr].
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class FakeSerial:
+    def __init__(self, **kwargs):
+        self.sent: list[bytes] = []
+        self.replies: dict[int, bytes] = {}   # ADR → ответный буфер (b"" – молчит)
+        self._out = b""
+        self.in_waiting = 0
+
+    def reset_input_buffer(self):
+        self._out = b""
+
+    def write(self, frame: bytes):
+        self.sent.append(bytes(frame))
+        self._out = self.replies.get(frame[1], b"")
+
+    def flush(self):
+        pass
+
+    def read(self, n: int = 1) -> bytes:
+        chunk, self._out = self._out[:n], self._out[n:]
+        return chunk
+
+
+_serial = types.ModuleType("serial")
+_serial.Serial = FakeSerial
+_serial.PARITY_ODD = "O"
+sys.modules["serial"] = _serial
+
+
+def _crc0_frame(head) -> bytes:
+    """
+    Кадр STX <head(x)> CRC-L CRC-H ETX SF, для которого CRC-0 по региону
+    ADR…CRC-L (как проверяет DartDriver._exchange) равен нулю.
+    x (байт CTRL/SEQ) и CRC-L подбираются перебором.
+    """
+    from app.driver import calc_crc
+
+    for x in range(256):
+        for crc_l in range(256):
+            region = head(x) + bytes([crc_l])
+            if 0x03 in region:          # первый ETX должен быть настоящим
+                continue
+            if calc_crc(region) == 0:
+                return bytes([0x02]) + region + bytes([0x00, 0x03, 0xFA])
+    raise AssertionError("CRC-0 frame not found")
+
+
+def make_reply(addr: int, blocks: bytes) -> bytes:
+    """Ответ на RETURN_STATUS: STX ADR CTRL SEQ LNG <блоки> … (разбор _parse_frame)."""
+    return _crc0_frame(lambda seq: bytes([addr, 0x00, seq, len(blocks)]) + blocks)
+
+
+def make_dc1_reply(addr: int, status: int) -> bytes:
+    """Ответ на команду CD1: STX ADR CTRL DC1 LNG STATUS … (разбор _parse_dc1)."""
+    return _crc0_frame(lambda ctrl: bytes([addr, ctrl, 0x01, 0x01, status]))
+
+
+@pytest.fixture
+def line(monkeypatch):
+    """Эмулятор линии общего драйвера; очищает историю между тестами."""
+    from app import driver as drv
+    from app.history import history
+
+    monkeypatch.setattr(drv, "TIMEOUT", 0.05)
+    monkeypatch.setattr(history, "_rings", {})
+    ser = FakeSerial()
+    monkeypatch.setattr(drv.driver, "_ser", ser)
+    return ser
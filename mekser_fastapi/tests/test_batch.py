@@ -0,0 +1,54 @@
+import pytest
+
+from app.core import PumpService
+from app.enums import DartTrans, DccCmd, PumpStatus
+from conftest import make_dc1_reply
+
+
+def test_duplicate_pump_is_rejected_before_bus(line):
+    with pytest.raises(ValueError):
+        PumpService.batch([{"pump_id": 1, "command": DccCmd.AUTHORIZE},
+                           {"pump_id": 1, "command": DccCmd.STOP}])
+    assert line.sent == []
+
+
+def test_authorize_skipped_when_preset_not_acknowledged(line):
+    line.replies[0x52] = make_dc1_reply(0x52, PumpStatus.RESET)   # 0x51 молчит
+
+    results = PumpService.batch([
+        {"pump_id": 1, "command": DccCmd.AUTHORIZE, "volume": 5.0},
+        {"pump_id": 2, "command": DccCmd.STOP},
+    ])
+
+    assert results[0]["ok"] is False
+    assert results[0]["error"] == "Preset not acknowledged"
+    assert results[1]["ok"] is True
+    sent_to_1 = [f[5] for f in line.sent if f[1] == 0x51]
+    assert sent_to_1 == [DartTrans.CD3] * 3                       # AUTHORIZE не ушёл
+
+
+def test_stop_goes_before_preset_and_authorize(line):
+    for addr in (0x51, 0x52):
+        line.replies[addr] = make_dc1_reply(addr, PumpStatus.AUTHORIZED)
+
+    results = PumpService.batch([
+        {"pump_id": 1, "command": DccCmd.AUTHORIZE, "amount": 10.0},
+        {"pump_id": 2, "command": DccCmd.STOP},
+    ])
+
+    assert [r["ok"] for r in results] == [True, True]
+    assert [(f[1], f[5], f[7]) for f in line.sent] == [
+        (0x52, DartTrans.CD1, DccCmd.STOP),
+        (0x51, DartTrans.CD4, 0x00),
+        (0x51, DartTrans.CD1, DccCmd.AUTHORIZE),
+    ]
+
+
+@pytest.mark.parametrize("command", [
+    {"pump_id": 1, "command": DccCmd.STOP, "volume": 5.0},
+    {"pump_id": 1, "command": DccCmd.AUTHORIZE, "volume": 5.0, "amount": 10.0},
+])
+def test_invalid_preset_is_rejected_before_bus(line, command):
+    with pytest.raises(ValueError):
+        PumpService.batch([command])
+    assert line.sent == []
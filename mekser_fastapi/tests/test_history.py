@@ -0,0 +1,50 @@
+import pytest
+
+from app.core import PumpService
+from app.history import HistoryStore, history
+from conftest import make_reply
+
+# DC1 FILLING + DC2 volume 12.34 л / amount 567.89
+DC1_DC2 = bytes([0x01, 0x01, 0x04,
+                 0x02, 0x08, 0x00, 0x00, 0x12, 0x34, 0x00, 0x00, 0x56, 0x78])
+
+
+def test_return_status_records_history(line):
+    line.replies[0x51] = make_reply(0x51, DC1_DC2)
+
+    parsed = PumpService.return_status(1)
+
+    assert parsed["status"] == "FILLING"
+    samples = history.query(1, 0, 1e12)
+    assert len(samples) == 1
+    assert samples[0]["status"] == "FILLING"
+    assert samples[0]["volume"] == 12.34
+    assert samples[0]["amount"] == 56.78
+
+
+def test_unchanged_state_is_not_duplicated(line):
+    line.replies[0x51] = make_reply(0x51, DC1_DC2)
+
+    PumpService.return_status(1)
+    PumpService.return_status(1)
+
+    assert len(history.query(1, 0, 1e12)) == 1
+
+
+def test_timestamps_never_go_backwards():
+    store = HistoryStore(capacity=8, heartbeat=60)
+    store.record(1, {"status": "RESET"}, ts=100.0)
+    store.record(1, {"status": "FILLING"}, ts=90.0)
+
+    samples = store.query(1, 0, 1e12)
+    assert [s["ts"] for s in samples] == [100.0, 100.0]
+    assert [s["status"] for s in store.query(1, 100.0, 100.0)] == ["RESET", "FILLING"]
+
+
+def test_query_rejects_non_finite_bounds():
+    store = HistoryStore(capacity=8, heartbeat=60)
+    store.record(1, {"status": "RESET"}, ts=100.0)
+
+    for args in ((float("-inf"), 1e12, 60), (0, float("nan"), 60), (0, 1e12, float("inf"))):
+        with pytest.raises(ValueError):
+            store.query(1, *args)
@@ -0,0 +1,87 @@
+import gzip
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from app.outbox import Outbox
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    ob = Outbox(url="http://127.0.0.1:9/ingest", db_path=str(tmp_path / "outbox.sqlite3"))
+    ob.start()
+    yield ob
+    ob.stop()
+
+
+def _kinds(ob):
+    with ob._lock:
+        return [row[0] for row in ob._db.execute(
+            "SELECT json_extract(payload, '$.kind') FROM events ORDER BY id")]
+
+
+def _sample(status):
+    return {"ts": 1.0, "status": status, "volume": 5.0, "amount": 10.0, "alarm": None}
+
+
+def test_fill_emitted_on_observed_transition(outbox):
+    outbox.on_state(1, _sample("FILLING_COMPLETE"), _sample("FILLING"))
+    assert _kinds(outbox) == ["state", "fill"]
+
+
+def test_no_fill_for_first_sample_after_restart(outbox):
+    outbox.on_state(1, _sample("FILLING_COMPLETE"), None)
+    assert _kinds(outbox) == ["state"]
+
+
+def test_batch_body_is_gzip_json_with_ids(outbox, monkeypatch):
+    captured = {}
+
+    class _Resp:
+        status = 204
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+
+    def fake_urlopen(req, timeout):
+        captured["body"] = json.loads(gzip.decompress(req.data))
+        return _Resp()
+
+    monkeypatch.setattr(urllib.request, "urlopen", fake_urlopen)
+    outbox.enqueue("state", 2, {"ts": 1.0, "status": "RESET"})
+
+    assert outbox._ship(outbox._next_batch())
+    events = captured["body"]["events"]
+    assert events == [{"id": 1, "kind": "state", "pump_id": 2, "ts": 1.0, "status": "RESET"}]
+
+
+def _http_error(code):
+    def fake_urlopen(req, timeout):
+        raise urllib.error.HTTPError(req.full_url, code, "error", {}, None)
+    return fake_urlopen
+
+
+def test_rejected_batch_is_dead_lettered_and_queue_advances(outbox, monkeypatch):
+    monkeypatch.setattr(urllib.request, "urlopen", _http_error(400))
+    outbox.enqueue("state", 1, {"ts": 1.0, "status": "RESET"})
+
+    batch = outbox._next_batch()
+    assert outbox._ship(batch)
+    outbox._ack(batch)
+
+    assert outbox._next_batch() == []
+    with outbox._lock:
+        rejected = outbox._db.execute("SELECT id, http_status FROM rejected").fetchall()
+    assert rejected == [(1, 400)]
+
+
+@pytest.mark.parametrize("code", [429, 503])
+def test_transient_http_error_keeps_batch(outbox, monkeypatch, code):
+    monkeypatch.setattr(urllib.request, "urlopen", _http_error(code))
+    outbox.enqueue("state", 1, {"ts": 1.0, "status": "RESET"})
+
+    assert not outbox._ship(outbox._next_batch())
+    assert len(outbox._next_batch()) == 1
@@ -0,0 +1,80 @@
+import logging
+
+import pytest
+
+from app import tracing
+from app.core import PumpService
+from app.driver import calc_crc, driver
+from app.enums import DartTrans, DccCmd
+
+
+def _metrics(header: str) -> dict:
+    """Server-Timing → {имя: строка метрики}."""
+    return {part.split(";", 1)[0]: part for part in header.split(", ")}
+
+
+def test_server_timing_breakdown_for_silent_pump(line):
+    token = tracing.begin("GET /pump/1/status")
+    assert PumpService.return_status(1) == {}
+    header = tracing.finish(token)
+
+    metrics = _metrics(header)
+    for name in ("lock", "write", "rx", "backoff", "transact", "total"):
+        assert name in metrics
+    assert metrics["write"].endswith('desc="n=3"')
+    assert metrics["retry"] == 'retry;desc="2"'
+    assert metrics["no_response"] == 'no_response;desc="3"'
+    assert "parse" not in metrics                      # до разбора не дошли
+
+
+def test_sampled_slow_request_logs_span_tree(line, monkeypatch, caplog):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    monkeypatch.setattr(tracing, "TRACE_SLOW_MS", 0.0)
+
+    token = tracing.begin("GET /pump/1/status")
+    PumpService.return_status(1)
+    with caplog.at_level(logging.WARNING, logger="mekser.trace"):
+        tracing.finish(token)
+
+    [record] = [r for r in caplog.records if r.name == "mekser.trace"]
+    tree = record.getMessage()
+    assert "GET /pump/1/status" in tree
+    assert "\n  return_status " in tree
+    assert "\n    transact " in tree
+    assert "\n      rx " in tree
+    assert "retry=2" in tree and "no_response=3" in tree
+
+
+def test_span_without_trace_records_nothing():
+    assert tracing.current() is None
+    with tracing.span("lock"):
+        tracing.incr("retry")
+    assert tracing.current() is None
+    assert tracing.finish(None) is None
+
+
+def test_transact_retries_three_times_on_crc_failure(line):
+    hdr = bytes([0x51, 0x00, 0x01, 0x01, 0x04])
+    crc_l = next(b for b in range(256) if b != 0x03 and calc_crc(hdr + bytes([b])) != 0)
+    line.replies[0x51] = bytes([0x02]) + hdr + bytes([crc_l, 0x00, 0x03, 0xFA])
+
+    token = tracing.begin("transact")
+    reply = driver.transact(0x51, [bytes([DartTrans.CD1, 0x01, DccCmd.RETURN_STATUS])])
+    metrics = _metrics(tracing.finish(token))
+
+    assert reply == b""
+    assert len(line.sent) == 3
+    assert len(set(line.sent)) == 1                    # повтор того же кадра (SEQ не меняется)
+    assert metrics["crc_error"] == 'crc_error;desc="3"'
+
+
+def test_middleware_sets_server_timing_header(line):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    response = TestClient(app).get("/pump/1/status")
+
+    assert response.status_code == 504
+    assert "rx;dur=" in response.headers["Server-Timing"]
+    assert "total;dur=" in response.headers["Server-Timing"]